@@ -5,21 +5,135 @@ import sys
 import os
 import re
 import json
-import traceback
 import codecs
-import json
+import threading
 from PyQt5 import QtWidgets, QtGui, QtCore
-from openrouter_api import summarize_text
+from openrouter_api import summarize_text, DEFAULT_MODEL
+
+# 模型下拉框的可选项，在模块加载时构建一次
+MODELS = (
+    DEFAULT_MODEL,
+    "meta-llama/llama-4-scout:free",
+    "deepseek/deepseek-v3-base:free",
+    "google/gemini-2.5-pro-preview-03-25",
+    "openai/gpt-4.5-preview",
+    "openai/o1-pro",
+)
+
+# 应用程序图标，相对于脚本所在目录解析，启动时只检查一次
+ICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", "icon.png")
+HAS_ICON = os.path.isfile(ICON_PATH)
+
+# 章节标题行：去掉首尾空白后以"第"开头且包含"章"，或以"Chapter"开头且不足30字
+CHAPTER_PATTERN = re.compile(
+    r'^[^\S\n]*(第[^\n]*?章[^\n]*?|Chapter[^\n]{0,22}?)[^\S\n]*$',
+    re.MULTILINE
+)
+
+# 小说文件可能的编码，按尝试顺序排列
+NOVEL_ENCODINGS = ('utf-8', 'gbk', 'gb18030')
+
+def decodeNovel(raw):
+    # 依次尝试各编码，全部失败时抛出最后一次的UnicodeDecodeError
+    for encoding in NOVEL_ENCODINGS[:-1]:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return raw.decode(NOVEL_ENCODINGS[-1])
+
+def splitChapters(content):
+    # 在全文上一次扫描出所有章节标题，每章内容从标题行开始直到下一章标题之前
+    # 只记录各章在全文中的起止位置，正文在用到时再切片
+    chapters = []
+    matches = list(CHAPTER_PATTERN.finditer(content))
+    for i, match in enumerate(matches):
+        if i + 1 < len(matches):
+            end = matches[i + 1].start() - 1  # 不包含下一章标题前的换行符
+        else:
+            end = len(content)
+        chapters.append({
+            'title': match.group(1),
+            'start': match.start(),
+            'end': end
+        })
+    return chapters
+
+def startDaemonThread(target):
+    # 在后台线程中执行target，结果由各任务通过信号交回界面线程
+    # 使用守护线程，关闭窗口时无需等待任务结束
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+
+class NovelLoader(QtCore.QObject):
+    # 读取并解析小说文件；正文可能很大，用object类型传递以免转换为QString
+    loaded = QtCore.pyqtSignal(object, object, object)
+    failed = QtCore.pyqtSignal(object, str)
+    
+    def __init__(self, filepath):
+        super(NovelLoader, self).__init__()
+        
+        self.filepath = filepath
+    
+    def run(self):
+        try:
+            # 读取小说文件，只读一次，再在内存中尝试不同编码
+            with open(self.filepath, 'rb') as f:
+                content = decodeNovel(f.read())
+            
+            self.loaded.emit(self, content, splitChapters(content))
+        except Exception as e:
+            self.failed.emit(self, str(e))
+
+class SummaryWorker(QtCore.QObject):
+    # 生成单章摘要，流式文本逐段发出
+    chunkReceived = QtCore.pyqtSignal(object, str)
+    summaryReady = QtCore.pyqtSignal(object, str)
+    failed = QtCore.pyqtSignal(object, str)
+    
+    def __init__(self, index, title, content, summary_len, model):
+        super(SummaryWorker, self).__init__()
+        
+        self.index = index
+        self.title = title
+        self.content = content
+        self.summary_len = summary_len
+        self.model = model
+        self.received_chunks = []  # 界面线程中记录已收到的文本，切回该章节时恢复
+    
+    def run(self):
+        try:
+            summary = summarize_text(
+                self.content,
+                self.summary_len,
+                model=self.model,
+                callback=lambda chunk: self.chunkReceived.emit(self, chunk)
+            )
+            self.summaryReady.emit(self, summary)
+        except Exception as e:
+            self.failed.emit(self, str(e))
 
 class NovelSummarizer(QtWidgets.QMainWindow):
     def __init__(self):
         super(NovelSummarizer, self).__init__()
         
+        self.novel_path = None
         self.novel_content = ""
         self.chapters = []
         self.chapter_summaries = {}
         self.current_chapter_index = -1
-        self.current_model = "meta-llama/llama-4-maverick:free"
+        self.current_model = DEFAULT_MODEL
+        self.summary_worker = None
+        self.novel_loader = None
+        self.saved_summaries = None  # 上次写入的(路径, 内容)
+        
+        # 流式文本先缓存，定时合并后一次性插入，避免每段文本都触发重绘
+        self.pending_chunks = []
+        self.chunkTimer = QtCore.QTimer(self)
+        self.chunkTimer.setSingleShot(True)
+        self.chunkTimer.setInterval(50)
+        self.chunkTimer.timeout.connect(self.flushSummaryChunks)
         
         self.initUI()
         self.loadNovel("novels/凡人修仙传.txt")
@@ -42,15 +156,7 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         # 模型选择
         modelLabel = QtWidgets.QLabel(u"模型:")
         self.modelCombo = QtWidgets.QComboBox()
-        self.modelCombo.addItems([
-            "meta-llama/llama-4-maverick:free",
-            "meta-llama/llama-4-scout:free",
-            "deepseek/deepseek-v3-base:free",
-            "google/gemini-2.5-pro-preview-03-25",
-            "openai/gpt-4.5-preview",
-            "openai/o1-pro",
-
-        ])
+        self.modelCombo.addItems(MODELS)
         self.modelCombo.setEditable(True)
         self.modelCombo.currentIndexChanged.connect(self.changeModel)
         
@@ -93,6 +199,11 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         
         # 左侧章节列表
         self.chapterList = QtWidgets.QListWidget()
+        # 所有章节行高度相同，避免逐行测量尺寸
+        self.chapterList.setUniformItemSizes(True)
+        # 分批布局，章节很多时不阻塞界面
+        self.chapterList.setLayoutMode(QtWidgets.QListView.Batched)
+        self.chapterList.setBatchSize(200)
         self.chapterList.currentRowChanged.connect(self.chapterSelected)
         
         # 右侧内容区域 - 使用垂直分割器
@@ -108,11 +219,11 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         summaryLayout.setContentsMargins(0, 0, 0, 0)  # 减少边距
         
         self.summaryTextEdit = QtWidgets.QTextEdit()
-        summarizeButton = QtWidgets.QPushButton(u"生成摘要")
-        summarizeButton.clicked.connect(self.generateSummary)
+        self.summarizeButton = QtWidgets.QPushButton(u"生成摘要")
+        self.summarizeButton.clicked.connect(self.generateSummary)
         
         summaryLayout.addWidget(self.summaryTextEdit)
-        summaryLayout.addWidget(summarizeButton)
+        summaryLayout.addWidget(self.summarizeButton)
         
         # 将部件添加到分割器
         self.horizontalSplitter.addWidget(self.chapterList)
@@ -137,67 +248,52 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         
     def loadNovel(self, filepath):
         self.statusBar().showMessage(u'正在加载小说: ' + filepath)
+        
+        # 检查文件是否存在
+        if not os.path.exists(filepath):
+            self.statusBar().showMessage(u'加载小说失败: 文件不存在 - ' + filepath)
+            return
+        
+        # 在后台线程中读取文件和分析章节，界面保持响应
+        self.novel_loader = NovelLoader(filepath)
+        self.novel_loader.loaded.connect(self.novelLoaded)
+        self.novel_loader.failed.connect(self.novelLoadFailed)
+        startDaemonThread(self.novel_loader.run)
+    
+    def novelLoaded(self, loader, content, chapters):
+        # 只应用最近一次加载的结果
+        if loader is not self.novel_loader:
+            return
+        
+        self.novel_loader = None
         try:
-            # 检查文件是否存在
-            if not os.path.exists(filepath):
-                self.statusBar().showMessage(u'加载小说失败: 文件不存在 - ' + filepath)
-                return
-                
-            # 读取小说文件，尝试不同编码
-            try:
-                with codecs.open(filepath, 'r', 'utf-8') as f:
-                    self.novel_content = f.read()
-            except UnicodeDecodeError:
-                try:
-                    with codecs.open(filepath, 'r', 'gbk') as f:
-                        self.novel_content = f.read()
-                except UnicodeDecodeError:
-                    with codecs.open(filepath, 'r', 'gb18030') as f:
-                        self.novel_content = f.read()
-            
-            # 分析章节
-            self.chapters = []
-            lines = self.novel_content.split('\n')
-            
-            chapter_start_line = 0
-            current_line = 0
-            chapter_title = u""
-            
-            for i, line in enumerate(lines):
-                # 检测章节标题，这里使用简单的启发式方法：以"第"开头且包含"章"的行
-                if (line.strip().startswith(u'第') and u'章' in line) or \
-                   (line.strip().startswith(u'Chapter') and len(line.strip()) < 30):
-                    
-                    # 如果不是第一个章节，就添加上一章
-                    if chapter_start_line > 0:
-                        chapter_content = '\n'.join(lines[chapter_start_line:i])
-                        self.chapters.append({
-                            'title': chapter_title,
-                            'content': chapter_content
-                        })
-                    
-                    chapter_start_line = i
-                    chapter_title = line.strip()
-                    current_line = i + 1
+            self.novel_path = loader.filepath
+            self.novel_content = content
+            self.chapters = chapters
+            self.current_chapter_index = -1
+            self.contentTextEdit.clear()
+            self.summaryTextEdit.clear()
             
-            # 添加最后一章
-            if chapter_start_line > 0:
-                chapter_content = '\n'.join(lines[chapter_start_line:])
-                self.chapters.append({
-                    'title': chapter_title,
-                    'content': chapter_content
-                })
-            
-            # 清空章节列表和摘要字典
-            self.chapterList.clear()
+            # 清空章节列表和摘要字典，重建期间暂停重绘和信号
+            self.chapterList.setUpdatesEnabled(False)
+            self.chapterList.blockSignals(True)
+            try:
+                self.chapterList.clear()
+                # 填充章节列表，一次性添加所有标题
+                self.chapterList.addItems([chapter['title'] for chapter in self.chapters])
+            finally:
+                self.chapterList.blockSignals(False)
+                self.chapterList.setUpdatesEnabled(True)
             self.chapter_summaries = {}
+            self.saved_summaries = None
             
-            # 填充章节列表
-            for chapter in self.chapters:
-                self.chapterList.addItem(chapter['title'])
+            # 丢弃上一本小说尚未完成的摘要请求
+            self.summary_worker = None
+            self.discardSummaryChunks()
+            self.summarizeButton.setEnabled(True)
             
             # 尝试加载现有摘要
-            summary_path = filepath.replace('.txt', '_summaries.json')
+            summary_path = self.summariesPath()
             if os.path.exists(summary_path):
                 self.loadSummariesFromFile(summary_path)
             
@@ -206,16 +302,30 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         except Exception as e:
             self.statusBar().showMessage(u'加载小说失败: ' + str(e))
     
+    def novelLoadFailed(self, loader, message):
+        if loader is not self.novel_loader:
+            return
+        
+        self.novel_loader = None
+        self.statusBar().showMessage(u'加载小说失败: ' + message)
+    
+    def chapterContent(self, index):
+        chapter = self.chapters[index]
+        return self.novel_content[chapter['start']:chapter['end']]
+    
     def chapterSelected(self, index):
         if index >= 0 and index < len(self.chapters):
             self.current_chapter_index = index
+            self.discardSummaryChunks()
             
             # 显示章节内容
-            self.contentTextEdit.setPlainText(self.chapters[index]['content'])
+            self.contentTextEdit.setPlainText(self.chapterContent(index))
             
-            # 显示摘要（如果有）
+            # 显示摘要（如果有）；该章节正在生成时恢复已收到的文本
             chapter_title = self.chapters[index]['title']
-            if chapter_title in self.chapter_summaries:
+            if self.summary_worker is not None and self.summary_worker.index == index:
+                self.summaryTextEdit.setPlainText(u"".join(self.summary_worker.received_chunks))
+            elif chapter_title in self.chapter_summaries:
                 self.summaryTextEdit.setPlainText(self.chapter_summaries[chapter_title])
             else:
                 self.summaryTextEdit.clear()
@@ -224,44 +334,124 @@ class NovelSummarizer(QtWidgets.QMainWindow):
         if self.current_chapter_index < 0:
             return
         
-        chapter = self.chapters[self.current_chapter_index]
+        index = self.current_chapter_index
+        chapter = self.chapters[index]
         summary_len = self.summaryLenSpinBox.value()
         
         self.statusBar().showMessage(u'正在生成摘要...')
+        self.summaryTextEdit.clear()
+        self.summarizeButton.setEnabled(False)
+        
+        # 在后台线程中流式生成，收到的文本即时显示在摘要区域，界面保持响应
+        self.summary_worker = SummaryWorker(
+            index,
+            chapter['title'],
+            self.chapterContent(index),
+            summary_len,
+            self.current_model
+        )
+        self.summary_worker.chunkReceived.connect(self.appendSummaryChunk)
+        self.summary_worker.summaryReady.connect(self.summaryGenerated)
+        self.summary_worker.failed.connect(self.summaryFailed)
+        startDaemonThread(self.summary_worker.run)
+    
+    def appendSummaryChunk(self, worker, chunk):
+        # 已重新加载小说时丢弃；用户切换到其他章节时只记录不显示
+        if worker is not self.summary_worker:
+            return
         
-        try:
-            summary = summarize_text(
-                chapter['content'], 
-                summary_len, 
-                model=self.current_model
-            )
-            
+        worker.received_chunks.append(chunk)
+        if self.current_chapter_index != worker.index:
+            return
+        
+        self.pending_chunks.append(chunk)
+        if not self.chunkTimer.isActive():
+            self.chunkTimer.start()
+    
+    def flushSummaryChunks(self):
+        if not self.pending_chunks:
+            return
+        
+        text = u"".join(self.pending_chunks)
+        self.pending_chunks = []
+        
+        # 用独立的光标在末尾插入，不影响用户的光标和选区；
+        # 只有原本就停在底部时才跟随滚动
+        scrollBar = self.summaryTextEdit.verticalScrollBar()
+        at_bottom = scrollBar.value() == scrollBar.maximum()
+        cursor = QtGui.QTextCursor(self.summaryTextEdit.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scrollBar.setValue(scrollBar.maximum())
+    
+    def discardSummaryChunks(self):
+        self.chunkTimer.stop()
+        self.pending_chunks = []
+    
+    def summaryGenerated(self, worker, summary):
+        if worker is not self.summary_worker:
+            return
+        
+        self.summary_worker = None
+        self.summarizeButton.setEnabled(True)
+        self.discardSummaryChunks()
+        
+        if self.current_chapter_index == worker.index:
             self.summaryTextEdit.setPlainText(summary)
-            self.chapter_summaries[chapter['title']] = summary
-            
-            self.statusBar().showMessage(u'摘要生成完成')
-        except Exception as e:
-            self.statusBar().showMessage(u'生成摘要失败: ' + str(e))
+        self.chapter_summaries[worker.title] = summary
+        
+        self.statusBar().showMessage(u'摘要生成完成')
+    
+    def summaryFailed(self, worker, message):
+        if worker is not self.summary_worker:
+            return
+        
+        self.summary_worker = None
+        self.summarizeButton.setEnabled(True)
+        self.flushSummaryChunks()
+        self.statusBar().showMessage(u'生成摘要失败: ' + message)
     
     def saveAllSummaries(self):
         if not self.chapters:
             return
         
-        # 获取原小说路径，将摘要保存在同一目录下
-        novel_path = "novels/凡人修仙传.txt"  # 默认路径
-        summary_path = novel_path.replace('.txt', '_summaries.json')
+        summary_path = self.summariesPath()
+        temp_path = summary_path + '.tmp'
         
         try:
-            with codecs.open(summary_path, 'w', 'utf-8') as f:
-                json.dump(self.chapter_summaries, f, ensure_ascii=False, indent=4)
+            data = json.dumps(self.chapter_summaries, ensure_ascii=False, indent=4)
+            
+            # 内容与上次保存的相同且文件仍在时无需重写
+            if self.saved_summaries == (summary_path, data) and os.path.exists(summary_path):
+                self.statusBar().showMessage(u'摘要未修改，无需保存: ' + summary_path)
+                return
+            
+            # 先写入临时文件再替换，避免写到一半时留下损坏的摘要文件
+            # 替换前先落盘，避免断电后替换得到的是空文件
+            with codecs.open(temp_path, 'w', 'utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, summary_path)
+            self.saved_summaries = (summary_path, data)
             
             self.statusBar().showMessage(u'摘要已保存到: ' + summary_path)
         except Exception as e:
+            # 写入或替换失败时清理临时文件
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
             self.statusBar().showMessage(u'保存摘要失败: ' + str(e))
     
+    def summariesPath(self):
+        # 摘要保存在当前小说所在目录下，文件名为小说名加_summaries.json
+        return os.path.splitext(self.novel_path)[0] + '_summaries.json'
+    
     def loadSummaries(self):
-        file_dialog = QtWidgets.QFileDialog()
-        summary_path, _ = file_dialog.getOpenFileName(
+        summary_path, _ = QtWidgets.QFileDialog.getOpenFileName(
             self, u"加载摘要文件", "novels", "JSON Files (*.json)"
         )
         
@@ -273,6 +463,15 @@ class NovelSummarizer(QtWidgets.QMainWindow):
             with codecs.open(summary_path, 'r', 'utf-8') as f:
                 self.chapter_summaries = json.load(f)
             
+            # 读入的正是保存目标时记下其内容，紧接着保存时无需重写
+            if self.novel_path is not None:
+                target_path = self.summariesPath()
+                if os.path.abspath(summary_path) == os.path.abspath(target_path):
+                    self.saved_summaries = (
+                        target_path,
+                        json.dumps(self.chapter_summaries, ensure_ascii=False, indent=4)
+                    )
+            
             # 如果当前有选中的章节，更新摘要显示
             if self.current_chapter_index >= 0:
                 chapter_title = self.chapters[self.current_chapter_index]['title']
@@ -284,8 +483,7 @@ class NovelSummarizer(QtWidgets.QMainWindow):
             self.statusBar().showMessage(u'加载摘要失败: ' + str(e))
     
     def browseNovel(self):
-        file_dialog = QtWidgets.QFileDialog()
-        novel_path, _ = file_dialog.getOpenFileName(
+        novel_path, _ = QtWidgets.QFileDialog.getOpenFileName(
             self, u"选择小说文件", "novels", "Text Files (*.txt)"
         )
         
@@ -301,8 +499,8 @@ def main():
     app.setStyle("Fusion")  # 设置现代化的风格
     
     # 设置应用程序图标
-    if os.path.exists("images/icon.png"):
-        app.setWindowIcon(QtGui.QIcon("images/icon.png"))
+    if HAS_ICON:
+        app.setWindowIcon(QtGui.QIcon(ICON_PATH))
     
     # 应用暗色模式样式表
     app.setStyleSheet("""
@@ -1,33 +1,82 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from openai import OpenAI
+import threading
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key="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",
-)
+_client = None
+_client_lock = threading.Lock()
 
+DEFAULT_MODEL = "meta-llama/llama-4-maverick:free"
 
-def summarize_text(text, len, model="meta-llama/llama-4-maverick:free"):
-  completion = client.chat.completions.create(
+SUMMARY_PROMPT = u"请把以下文本缩写为{0}字左右的摘要，保留关键信息，直接给出结果：\n\n{1}\n\n摘要："
+
+
+def get_client():
+  # 首次调用时才创建客户端，之后所有请求共用同一个实例
+  global _client
+  with _client_lock:
+    if _client is None:
+      # openai及其依赖导入较慢，推迟到第一次请求时再导入
+      from openai import OpenAI
+      _client = OpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key="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",
+      )
+  return _client
+
+
+def summarize_text(text, length, model=DEFAULT_MODEL, callback=None):
+  # 原文不超过摘要长度时无需请求模型，直接返回原文
+  if len(text) <= length:
+    if callback is not None:
+      callback(text)
+    return text
+
+  messages = [
+      {
+        "role": "user",
+        "content": SUMMARY_PROMPT.format(length, text)
+      }
+    ]
+  if callback is not None:
+    return _stream_summary(messages, model, callback)
+
+  # 与流式一样，请求或读取结果出错时直接抛给调用方，不把错误文本当作摘要返回
+  completion = get_client().chat.completions.create(
+    model=model,
+    messages=messages
+    )
+  return _strip_summary_label(completion.choices[0].message.content or u"")
+
+
+def _strip_summary_label(summary):
+  # 部分模型会在回复开头照抄提示词末尾的"摘要："，只去掉开头的这个标签
+  stripped = summary.lstrip()
+  if stripped.startswith(u"摘要："):
+    return stripped[len(u"摘要："):].strip()
+  return summary
+
+
+def _stream_summary(messages, model, callback):
+  # 流式获取摘要，每收到一段文本就交给callback，最后返回完整摘要
+  stream = get_client().chat.completions.create(
     model=model,
-    messages=[
-        {
-          "role": "user",
-          "content": u"请把以下文本缩写为{0}字左右的摘要，保留关键信息，直接给出结果：\n\n{1}\n\n摘要：".format(len, text)
-        }
-      ]
+    messages=messages,
+    stream=True
     )
-  try:
-    response = completion.choices[0].message.content
-  except Exception as e:
-    print(e)
-    return u"获取摘要失败"
+  pieces = []
+  # 读取中途出错时直接抛给调用方，已收到的部分由callback保留
+  for chunk in stream:
+    if not chunk.choices:
+      continue
+    delta = chunk.choices[0].delta.content
+    if delta:
+      pieces.append(delta)
+      callback(delta)
 
-  return response
+  return _strip_summary_label(u"".join(pieces))
 
 
 if __name__ == "__main__":
   text = u"""二愣子睁大着双眼，直直望着茅草和烂泥糊成的黑屋顶，身上盖着的旧棉被，已呈深黄色，看不出原来的本来面目，还若有若无的散发着淡淡的霉味。"""
-  print(summarize_text(text, 10, "meta-llama/llama-4-maverick:free"))
\ No newline at end of file
+  print(summarize_text(text, 10, DEFAULT_MODEL))
\ No newline at end of file